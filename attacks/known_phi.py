@@ -3,6 +3,7 @@ from math import isqrt
 from random import randrange
 
 from sage.all import is_prime
+from sage.all import is_square
 
 
 def factorize(N, phi):
@@ -15,9 +16,14 @@ def factorize(N, phi):
     """
     s = N + 1 - phi
     d = s ** 2 - 4 * N
-    p = int(s - isqrt(d)) // 2
-    q = int(s + isqrt(d)) // 2
-    return p, q if p * q == N else None
+    # p and q are the roots of z^2 - sz + N, so the discriminant must be a square.
+    if d < 0 or not is_square(d):
+        return None
+
+    r = isqrt(d)
+    p = int(s - r) // 2
+    q = int(s + r) // 2
+    return (p, q) if p * q == N else None
 
 
 def factorize_multi_prime(N, phi):
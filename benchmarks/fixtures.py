@@ -0,0 +1,111 @@
+from math import gcd
+from random import Random
+
+from sage.all import next_prime
+
+
+def _random_prime(rng, bit_length):
+    while True:
+        p = int(next_prime(rng.getrandbits(bit_length) | (1 << (bit_length - 1))))
+        if p.bit_length() == bit_length:
+            return p
+
+
+def _small_d(rng, N, phi, delta):
+    d_bit_length = int(delta * N.bit_length())
+    while True:
+        d = rng.getrandbits(d_bit_length) | (1 << (d_bit_length - 1)) | 1
+        if gcd(d, phi) == 1:
+            return d
+
+
+def small_d_key(seed, factor_bit_length, delta):
+    """
+    Generates an RSA key with two prime factors and a small private exponent.
+    :param seed: the seed for the random number generator
+    :param factor_bit_length: the bit length of the prime factors
+    :param delta: the bound on the private exponent (d < N^delta)
+    :return: a dict containing N, e, d, and the prime factors
+    """
+    rng = Random(seed)
+    p = _random_prime(rng, factor_bit_length)
+    q = _random_prime(rng, factor_bit_length)
+    while q == p:
+        q = _random_prime(rng, factor_bit_length)
+
+    N = p * q
+    phi = (p - 1) * (q - 1)
+    d = _small_d(rng, N, phi, delta)
+    return {"N": N, "e": pow(d, -1, phi), "d": d, "factors": (p, q)}
+
+
+def multi_prime_key(seed, factor_bit_length, factors, delta):
+    """
+    Generates an RSA key with multiple prime factors and a small private exponent.
+    :param seed: the seed for the random number generator
+    :param factor_bit_length: the bit length of the prime factors
+    :param factors: the number of prime factors
+    :param delta: the bound on the private exponent (d < N^delta)
+    :return: a dict containing N, e, d, and the prime factors
+    """
+    rng = Random(seed)
+    primes = set()
+    while len(primes) < factors:
+        primes.add(_random_prime(rng, factor_bit_length))
+
+    N = 1
+    phi = 1
+    for p in primes:
+        N *= p
+        phi *= p - 1
+
+    d = _small_d(rng, N, phi, delta)
+    return {"N": N, "e": pow(d, -1, phi), "d": d, "factors": tuple(sorted(primes))}
+
+
+class PaddingOracle:
+    """
+    A local PKCS #1 v1.5 padding oracle which counts the amount of queries.
+    Only checks whether the plaintext starts with 0x00 0x02, and decrypts using the CRT.
+    """
+
+    def __init__(self, n, p, q, d):
+        self.queries = 0
+        self._p = p
+        self._q = q
+        self._dp = d % (p - 1)
+        self._dq = d % (q - 1)
+        self._q_inv = pow(q, -1, p)
+        self._shift = 8 * ((n.bit_length() + 7) // 8 - 2)
+
+    def __call__(self, c):
+        self.queries += 1
+        mp = pow(c, self._dp, self._p)
+        mq = pow(c, self._dq, self._q)
+        m = mq + self._q * ((mp - mq) * self._q_inv % self._p)
+        return m >> self._shift == 2
+
+
+def pkcs1_ciphertext(seed, factor_bit_length, message_length=16):
+    """
+    Generates an RSA key and a PKCS #1 v1.5 padded ciphertext of a random message.
+    :param seed: the seed for the random number generator
+    :param factor_bit_length: the bit length of the prime factors
+    :param message_length: the length of the message in bytes (default: 16)
+    :return: a dict containing n, e, the ciphertext c, the plaintext m, and a padding oracle
+    """
+    rng = Random(seed)
+    e = 65537
+    while True:
+        p = _random_prime(rng, factor_bit_length)
+        q = _random_prime(rng, factor_bit_length)
+        n = p * q
+        phi = (p - 1) * (q - 1)
+        if p != q and n.bit_length() == 2 * factor_bit_length and gcd(e, phi) == 1:
+            break
+
+    k = (n.bit_length() + 7) // 8
+    padding = bytes(rng.randrange(1, 256) for _ in range(k - 3 - message_length))
+    message = bytes(rng.randrange(256) for _ in range(message_length))
+    m = int.from_bytes(b"\x00\x02" + padding + b"\x00" + message, "big")
+    return {"n": n, "e": e, "c": pow(m, e, n), "m": m, "oracle": PaddingOracle(n, p, q, pow(e, -1, phi))}
@@ -0,0 +1,203 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import time
+
+path = os.path.dirname(os.path.dirname(os.path.realpath(os.path.abspath(__file__))))
+if path not in sys.path:
+    sys.path.insert(1, path)
+
+from benchmarks import fixtures
+
+# The committed baseline only contains deterministic metrics, which must match on every machine.
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+# Time and memory depend on the machine, so they are compared against a baseline which is not committed.
+LOCAL_BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.local.json")
+DETERMINISTIC_METRICS = ["success", "oracle_queries", "lattice_dimension"]
+RESOURCE_METRICS = ["wall_time", "cpu_time", "peak_memory"]
+
+# Each case is generated offline from its seed, so every run attacks exactly the same instances.
+CASES = [
+    {"name": "boneh_durfee_128_0.20", "attack": "boneh_durfee", "seed": 1, "factor_bit_length": 128, "delta": 0.20, "m": 2},
+    {"name": "boneh_durfee_256_0.22", "attack": "boneh_durfee", "seed": 2, "factor_bit_length": 256, "delta": 0.22, "m": 3},
+    {"name": "boneh_durfee_256_0.25", "attack": "boneh_durfee", "seed": 3, "factor_bit_length": 256, "delta": 0.25, "m": 5},
+    {"name": "boneh_durfee_512_0.26", "attack": "boneh_durfee", "seed": 4, "factor_bit_length": 512, "delta": 0.26, "m": 3},
+    {"name": "multi_prime_3x128_0.10", "attack": "multi_prime", "seed": 5, "factor_bit_length": 128, "factors": 3, "delta": 0.10, "m": 4},
+    {"name": "multi_prime_4x128_0.08", "attack": "multi_prime", "seed": 6, "factor_bit_length": 128, "factors": 4, "delta": 0.08, "m": 5},
+    {"name": "bleichenbacher_256", "attack": "bleichenbacher", "seed": 7, "factor_bit_length": 128},
+    {"name": "bleichenbacher_512", "attack": "bleichenbacher", "seed": 8, "factor_bit_length": 256},
+]
+
+
+def _attack_boneh_durfee(case):
+    import boneh_durfee
+
+    key = fixtures.small_d_key(case["seed"], case["factor_bit_length"], case["delta"])
+    factors = boneh_durfee.attack(key["N"], key["e"], case["factor_bit_length"], delta=case["delta"], m=case["m"])
+    return factors is not None and set(factors) == set(key["factors"]), None
+
+
+def _attack_multi_prime(case):
+    import boneh_durfee
+
+    key = fixtures.multi_prime_key(case["seed"], case["factor_bit_length"], case["factors"], case["delta"])
+    factors = boneh_durfee.attack_multi_prime(key["N"], key["e"], case["factor_bit_length"], case["factors"], delta=case["delta"], m=case["m"])
+    return factors is not None and set(factors) == set(key["factors"]), None
+
+
+def _attack_bleichenbacher(case):
+    import bleichenbacher
+
+    instance = fixtures.pkcs1_ciphertext(case["seed"], case["factor_bit_length"])
+    random.seed(case["seed"])
+    m = bleichenbacher.attack(instance["oracle"], instance["n"], instance["e"], instance["c"])
+    return m == instance["m"], instance["oracle"].queries
+
+
+_ATTACKS = {
+    "boneh_durfee": _attack_boneh_durfee,
+    "multi_prime": _attack_multi_prime,
+    "bleichenbacher": _attack_bleichenbacher,
+}
+
+
+def _run_case(case):
+    from shared.small_roots import lattice_cache
+    from shared.small_roots import profiling
+
+    # Cache hits would skip lattice creation, and therefore the lattice dimension and most of the work.
+    lattice_cache.CACHE_DIR = None
+    profiling.enable()
+    start_wall = time.perf_counter()
+    start_cpu = time.process_time()
+    success, oracle_queries = _ATTACKS[case["attack"]](case)
+    wall_time = time.perf_counter() - start_wall
+    cpu_time = time.process_time() - start_cpu
+    records = profiling.disable()
+
+    lattice_records = [record for record in records if record["stage"] == "create_lattice"]
+    return {
+        "success": success,
+        "wall_time": wall_time,
+        "cpu_time": cpu_time,
+        "oracle_queries": oracle_queries,
+        "lattice_dimension": max((record["rows"] for record in lattice_records), default=None),
+        # Profiling resets the peak resident set size at every stage, so the stage peaks are included as well.
+        # ru_maxrss is reported in kilobytes on Linux.
+        "peak_memory": max(
+            [resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024]
+            + [record["peak_memory"] for record in records if record["peak_memory"] is not None]
+        ),
+        "stages": records,
+    }
+
+
+def run(cases):
+    """
+    Runs benchmark cases, each in a fresh process so peak memory is measured per case.
+    :param cases: the benchmark cases
+    :return: a dict of (name: result) entries
+    """
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    for case in cases:
+        logging.info(f"Running {case['name']}...")
+        with context.Pool(1) as pool:
+            results[case["name"]] = pool.apply(_run_case, (case,))
+
+        logging.info(f"{case['name']}: {results[case['name']]['wall_time']:.3f} s")
+
+    return results
+
+
+def compare(results, baseline, local_baseline=None, tolerance=0.25):
+    """
+    Compares benchmark results against a baseline.
+    Deterministic metrics must match the baseline exactly, time and memory may exceed the local baseline by the tolerance.
+    :param results: the benchmark results
+    :param baseline: the baseline containing deterministic metrics
+    :param local_baseline: the machine-local baseline containing time and memory (default: None, time and memory are not compared)
+    :param tolerance: the allowed relative increase in time and memory (default: 0.25)
+    :return: a list of regression messages
+    """
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get(name, {})
+        if not result["success"]:
+            regressions.append(f"{name}: attack no longer succeeds")
+
+        for metric in ["oracle_queries", "lattice_dimension"]:
+            if metric in expected and result[metric] != expected[metric]:
+                regressions.append(f"{name}: {metric} changed from {expected[metric]} to {result[metric]}")
+
+        if local_baseline is None or name not in local_baseline:
+            continue
+
+        expected = local_baseline[name]
+        for metric in RESOURCE_METRICS:
+            if result[metric] > expected[metric] * (1 + tolerance):
+                regressions.append(f"{name}: {metric} increased from {expected[metric]} to {result[metric]}")
+
+    return regressions
+
+
+def _load(path):
+    if not os.path.exists(path):
+        return None
+
+    with open(path) as file:
+        return json.load(file)
+
+
+def _save(path, baseline, results):
+    baseline.update(results)
+    with open(path, "w") as file:
+        json.dump(baseline, file, indent=4)
+        file.write("\n")
+
+    logging.info(f"Stored baseline in {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs the benchmark suite and compares the results against a baseline.")
+    parser.add_argument("cases", nargs="*", help="the names of the cases to run (default: all cases)")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="the baseline file containing deterministic metrics")
+    parser.add_argument("--local-baseline", default=LOCAL_BASELINE_PATH, help="the machine-local baseline file containing time and memory")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baselines")
+    parser.add_argument("--output", help="write the results to this file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="the allowed relative increase in time and memory")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    cases = [case for case in CASES if not args.cases or case["name"] in args.cases]
+    results = run(cases)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=4)
+
+    baseline = _load(args.baseline) or {}
+    local_baseline = _load(args.local_baseline)
+    if args.save_baseline:
+        deterministic_results = {name: {metric: result[metric] for metric in DETERMINISTIC_METRICS} for name, result in results.items()}
+        _save(args.baseline, baseline, deterministic_results)
+        _save(args.local_baseline, local_baseline or {}, results)
+        return 0
+
+    if local_baseline is None:
+        logging.info(f"No local baseline found at {args.local_baseline}, only comparing deterministic metrics")
+
+    regressions = compare(results, baseline, local_baseline, args.tolerance)
+    for regression in regressions:
+        logging.error(regression)
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,13 @@
 import logging
 import os
 import sys
+import time
+from math import gcd
+from multiprocessing import Pool
 
 from sage.all import RR
 from sage.all import ZZ
+from sage.all import Zmod
 
 
 path = os.path.dirname(
@@ -16,7 +20,26 @@ from attacks import known_phi
 from shared import herrmann_may
 
 
-def attack(N, e, factor_bit_length, partial_p=None, delta=0.25, m=1, t=None):
+def _recover_sum(N, e, f_e, x0, y0):
+    # Cheap check first: the root must be a root of f modulo e.
+    if f_e(x0, y0) != 0 or gcd(x0, e) != 1:
+        return None
+
+    # s = N + 1 - phi, which is p + q for a modulus with two prime factors.
+    k = pow(x0, -1, e)
+    return (N + 1 + k) % e
+
+
+def attack(
+    N,
+    e,
+    factor_bit_length,
+    partial_p=None,
+    delta=0.25,
+    m=1,
+    t=None,
+    roots_method="groebner",
+):
     """
     Recovers the prime factors if the private exponent is too small.
     This implementation exploits knowledge of least significant bits of prime factors, if available.
@@ -28,10 +51,19 @@ def attack(N, e, factor_bit_length, partial_p=None, delta=0.25, m=1, t=None):
     :param delta: a predicted bound on the private exponent (d < N^delta) (default: 0.25)
     :param m: the m value to use for the small roots method (default: 1)
     :param t: the t value to use for the small roots method (default: automatically computed using m)
+    :param roots_method: the method to use to find roots (default: "groebner")
     :return: a tuple containing the prime factors, or None if the factors were not found
     """
     # Use additional information about factors to speed up Boneh-Durfee.
     p_lsb, p_lsb_bit_length = (0, 0) if partial_p is None else partial_p.get_known_lsb()
+    return _attack(
+        N, e, factor_bit_length, p_lsb, p_lsb_bit_length, delta, m, t, roots_method
+    )
+
+
+def _attack(
+    N, e, factor_bit_length, p_lsb, p_lsb_bit_length, delta, m, t, roots_method
+):
     q_lsb = (pow(p_lsb, -1, 2**p_lsb_bit_length) * N) % (2**p_lsb_bit_length)
     A = (N >> p_lsb_bit_length) + pow(2, -p_lsb_bit_length, e) * (
         p_lsb * q_lsb - p_lsb - q_lsb + 1
@@ -43,20 +75,124 @@ def attack(N, e, factor_bit_length, partial_p=None, delta=0.25, m=1, t=None):
     Y = int(2 ** (factor_bit_length - p_lsb_bit_length + 1))
     t = int((1 - 2 * delta) * m) if t is None else t
     logging.info(f"Trying {m = }, {t = }...")
-    for x0, y0 in herrmann_may.modular_bivariate(f, e, m, t, X, Y):
-        z = int(f(x0, y0))
-        if z % e == 0:
-            k = pow(x0, -1, e)
-            s = (N + 1 + k) % e
-            phi = N - s + 1
-            factors = known_phi.factorize(N, phi)
-            if factors:
-                return factors
+    f_e = f.change_ring(Zmod(e))
+    for x0, y0 in herrmann_may.modular_bivariate(f, e, m, t, X, Y, roots_method):
+        s = _recover_sum(N, e, f_e, x0, y0)
+        if s is None:
+            continue
+
+        factors = known_phi.factorize(N, N - s + 1)
+        if factors:
+            return factors
 
     return None
 
 
-def attack_multi_prime(N, e, factor_bit_length, factors, delta=0.25, m=1, t=None):
+def _attack_guess(args):
+    start = time.perf_counter()
+    factors = _attack(*args)
+    return factors, time.perf_counter() - start
+
+
+def attack_guessed_lsb(
+    N,
+    e,
+    factor_bit_length,
+    guessed_bits,
+    partial_p=None,
+    delta=0.25,
+    m=1,
+    t=None,
+    roots_method="groebner",
+    processes=None,
+    full_m=None,
+):
+    """
+    Recovers the prime factors if the private exponent is too small by guessing least significant bits of p.
+    Each guess reduces the bound on y, so a smaller m can be used than for the full attack.
+    The guesses are attacked in parallel, and the search stops at the first factorization.
+    :param N: the modulus
+    :param e: the public exponent
+    :param factor_bit_length: the bit length of the prime factors
+    :param guessed_bits: the amount of least significant bits of p to guess, in addition to the known bits
+    :param partial_p: the partial prime factor p (PartialInteger) (default: None)
+    :param delta: a predicted bound on the private exponent (d < N^delta) (default: 0.25)
+    :param m: the m value to use for the small roots method for each guess (default: 1)
+    :param t: the t value to use for the small roots method for each guess (default: automatically computed using m)
+    :param roots_method: the method to use to find roots (default: "groebner")
+    :param processes: the amount of processes to use (default: the amount of CPUs)
+    :param full_m: if set, the full attack using only the known bits is also executed with this m value, to compare the running time (default: None)
+    :return: a tuple containing the prime factors, or None if the factors were not found
+    """
+    p_lsb, p_lsb_bit_length = (0, 0) if partial_p is None else partial_p.get_known_lsb()
+    if p_lsb_bit_length == 0:
+        # p is odd, so the least significant bit is always known.
+        p_lsb, p_lsb_bit_length = 1, 1
+
+    guesses = [
+        (
+            N,
+            e,
+            factor_bit_length,
+            p_lsb + (i << p_lsb_bit_length),
+            p_lsb_bit_length + guessed_bits,
+            delta,
+            m,
+            t,
+            roots_method,
+        )
+        for i in range(2**guessed_bits)
+    ]
+    processes = os.cpu_count() if processes is None else processes
+    logging.info(f"Trying {len(guesses)} guesses for the {p_lsb_bit_length + guessed_bits} least significant bits of p using {processes} processes...")
+
+    tried = 0
+    lattice_time = 0
+    result = None
+    start = time.perf_counter()
+    with Pool(processes) as pool:
+        for factors, elapsed in pool.imap_unordered(_attack_guess, guesses):
+            tried += 1
+            lattice_time += elapsed
+            if factors:
+                result = factors
+                break
+
+    elapsed = time.perf_counter() - start
+    logging.info(f"Tried {tried} of {len(guesses)} guesses in {elapsed:.3f} s ({tried / elapsed:.3f} guesses/s, {lattice_time / tried:.3f} s per guess)")
+    worst_case = len(guesses) * lattice_time / tried / processes
+    logging.info(f"Expected worst case running time: {worst_case:.3f} s")
+
+    if full_m is not None:
+        logging.info(f"Running the full attack with {full_m = } for comparison...")
+        start = time.perf_counter()
+        _attack(
+            N,
+            e,
+            factor_bit_length,
+            p_lsb,
+            p_lsb_bit_length,
+            delta,
+            full_m,
+            None,
+            roots_method,
+        )
+        full_elapsed = time.perf_counter() - start
+        logging.info(f"Full attack took {full_elapsed:.3f} s, {full_elapsed / worst_case:.3f} times the worst case of the guessing attack")
+
+    return result
+
+
+def attack_multi_prime(
+    N,
+    e,
+    factor_bit_length,
+    factors,
+    delta=0.25,
+    m=1,
+    t=None,
+    roots_method="groebner",
+):
     """
     Recovers the prime factors if the private exponent is too small.
     This method works for a modulus consisting of any number of primes.
@@ -67,6 +203,7 @@ def attack_multi_prime(N, e, factor_bit_length, factors, delta=0.25, m=1, t=None
     :param delta: a predicted bound on the private exponent (d < n^delta) (default: 0.25)
     :param m: the m value to use for the small roots method (default: 1)
     :param t: the t value to use for the small roots method (default: automatically computed using m)
+    :param roots_method: the method to use to find roots (default: "groebner")
     :return: a tuple containing the prime factors, or None if the factors were not found
     """
     x, y = ZZ["x", "y"].gens()
@@ -76,27 +213,28 @@ def attack_multi_prime(N, e, factor_bit_length, factors, delta=0.25, m=1, t=None
     Y = int(2 ** ((factors - 1) * factor_bit_length + 1))
     t = int((1 - 2 * delta) * m) if t is None else t
     logging.info(f"Trying {m = }, {t = }...")
-    for x0, y0 in herrmann_may.modular_bivariate(f, e, m, t, X, Y):
-        z = int(f(x0, y0))
-        if z % e == 0:
-            k = pow(x0, -1, e)
-            s = (N + 1 + k) % e
-            phi = N - s + 1
-            factors = known_phi.factorize_multi_prime(N, phi)
-            if factors:
-                return factors
+    f_e = f.change_ring(Zmod(e))
+    for x0, y0 in herrmann_may.modular_bivariate(f, e, m, t, X, Y, roots_method):
+        s = _recover_sum(N, e, f_e, x0, y0)
+        if s is None:
+            continue
+
+        factors = known_phi.factorize_multi_prime(N, N - s + 1)
+        if factors:
+            return factors
 
     return None
 
 
-# Some logging so we can see what's happening.
-logging.basicConfig(level=logging.DEBUG)
+if __name__ == "__main__":
+    # Some logging so we can see what's happening.
+    logging.basicConfig(level=logging.DEBUG)
 
-N = 88320836926176610260238895174120738360949322009576866758081671082752401596826820274141832913391890604999466444724537056453777218596634375604879123818123658076245218807184443147162102569631427096787406420042132112746340310992380094474893565028303466135529032341382899333117011402408049370805729286122880037249
-e = 36224751658507610673165956970793195381480143363550601971796688201449789736497322700382657163240771111376677180786660893671085854060092736865293791299460933460067267613023891500397200389824179925263846148644777638774319680682025117466596019474987378275216579013846855328009375540444176771945272078755317168511
-p_bits = 512
-delta = 0.26
+    N = 88320836926176610260238895174120738360949322009576866758081671082752401596826820274141832913391890604999466444724537056453777218596634375604879123818123658076245218807184443147162102569631427096787406420042132112746340310992380094474893565028303466135529032341382899333117011402408049370805729286122880037249
+    e = 36224751658507610673165956970793195381480143363550601971796688201449789736497322700382657163240771111376677180786660893671085854060092736865293791299460933460067267613023891500397200389824179925263846148644777638774319680682025117466596019474987378275216579013846855328009375540444176771945272078755317168511
+    p_bits = 512
+    delta = 0.26
 
-p, q = attack(N, e, p_bits, delta=delta, m=3)
-assert p * q == N
-print(f"Found {p = } and {q = }")
+    p, q = attack(N, e, p_bits, delta=delta, m=3)
+    assert p * q == N
+    print(f"Found {p = } and {q = }")
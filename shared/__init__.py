@@ -0,0 +1,18 @@
+def ceil_div(a, b):
+    """
+    Returns ceil(a / b), without rounding errors for large integers.
+    :param a: the dividend
+    :param b: the divisor
+    :return: the ceiled quotient
+    """
+    return -(-a // b)
+
+
+def floor_div(a, b):
+    """
+    Returns floor(a / b), without rounding errors for large integers.
+    :param a: the dividend
+    :param b: the divisor
+    :return: the floored quotient
+    """
+    return a // b
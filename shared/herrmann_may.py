@@ -3,6 +3,8 @@ import logging
 from sage.all import ZZ
 
 from shared import small_roots
+from shared.small_roots import lattice_cache
+from shared.small_roots import profiling
 
 
 def modular_bivariate(f, e, m, t, X, Y, roots_method="groebner"):
@@ -25,23 +27,31 @@ def modular_bivariate(f, e, m, t, X, Y, roots_method="groebner"):
     qr = pr.quotient(1 + x * y - u)
     U = X * Y
 
-    logging.debug("Generating shifts...")
+    key = lattice_cache.instance_key("herrmann_may", f, e, [X, Y], m, t)
+    cached = lattice_cache.load(key, pr)
+    if cached is None:
+        logging.debug("Generating shifts...")
 
-    shifts = []
-    for k in range(m + 1):
-        for i in range(m - k + 1):
-            g = x**i * f**k * e ** (m - k)
-            g = qr(g).lift()
-            shifts.append(g)
+        with profiling.stage("generate_shifts", m=m, t=t):
+            shifts = []
+            for k in range(m + 1):
+                for i in range(m - k + 1):
+                    g = x**i * f**k * e ** (m - k)
+                    g = qr(g).lift()
+                    shifts.append(g)
 
-    for j in range(1, t + 1):
-        for k in range(m // t * j, m + 1):
-            h = y**j * f**k * e ** (m - k)
-            h = qr(h).lift()
-            shifts.append(h)
+            for j in range(1, t + 1):
+                for k in range(m // t * j, m + 1):
+                    h = y**j * f**k * e ** (m - k)
+                    h = qr(h).lift()
+                    shifts.append(h)
 
-    L, monomials = small_roots.create_lattice(pr, shifts, [X, Y, U])
-    L = small_roots.reduce_lattice(L)
+        rows, exponents, monomials = small_roots.create_sparse_lattice(pr, shifts)
+        del shifts
+        L = small_roots.reduce_sparse_lattice(rows, exponents, [X, Y, U])
+        lattice_cache.store(key, L, monomials)
+    else:
+        L, monomials = cached
 
     pr = f.parent()
     x, y = pr.gens()
@@ -8,6 +8,8 @@ from sage.all import matrix
 from sage.all import solve
 from sage.all import var
 
+from shared.small_roots import profiling
+
 DEBUG_ROOTS = None
 
 
@@ -26,35 +28,104 @@ def log_lattice(L):
         logging.debug(r)
 
 
-def create_lattice(pr, shifts, bounds, order="invlex", sort_shifts_reverse=False, sort_monomials_reverse=False):
+def monomial_exponents(monomial):
     """
-    Creates a lattice from a list of shift polynomials.
+    Returns the exponents of a monomial.
+    :param monomial: the monomial
+    :return: a tuple containing the exponent of each variable
+    """
+    if monomial.parent().ngens() == 1:
+        return (int(monomial.degree()),)
+
+    return tuple(int(e) for e in monomial.degrees())
+
+
+def create_sparse_lattice(pr, shifts, order="invlex", sort_shifts_reverse=False, sort_monomials_reverse=False):
+    """
+    Creates an unscaled sparse lattice from a list of shift polynomials.
+    Each row only stores the nonzero coefficients of a shift, and each column stores the exponents of its monomial.
+    The bounds are only applied when the lattice is scaled.
     :param pr: the polynomial ring
     :param shifts: the shifts
-    :param bounds: the bounds
     :param order: the order to sort the shifts/monomials by
     :param sort_shifts_reverse: set to true to sort the shifts in reverse order
     :param sort_monomials_reverse: set to true to sort the monomials in reverse order
-    :return: a tuple of lattice and list of monomials
+    :return: a tuple of list of rows (dicts of (column: coefficient) entries), list of column exponents, and list of monomials
     """
     logging.debug(f"Creating a lattice with {len(shifts)} shifts ({order = }, {sort_shifts_reverse = }, {sort_monomials_reverse = })...")
-    if pr.ngens() > 1:
-        pr_ = pr.change_ring(ZZ, order=order)
-        shifts = [pr_(shift) for shift in shifts]
+    with profiling.stage("create_lattice") as record:
+        if pr.ngens() > 1:
+            pr_ = pr.change_ring(ZZ, order=order)
+            shifts = [pr_(shift) for shift in shifts]
 
-    monomials = set()
-    for shift in shifts:
-        monomials.update(shift.monomials())
+        monomials = set()
+        for shift in shifts:
+            monomials.update(shift.monomials())
 
-    shifts.sort(reverse=sort_shifts_reverse)
-    monomials = sorted(monomials, reverse=sort_monomials_reverse)
-    L = matrix(ZZ, len(shifts), len(monomials))
-    for row, shift in enumerate(shifts):
-        for col, monomial in enumerate(monomials):
-            L[row, col] = shift.monomial_coefficient(monomial) * monomial(*bounds)
+        shifts.sort(reverse=sort_shifts_reverse)
+        monomials = sorted(monomials, reverse=sort_monomials_reverse)
+        columns = {monomial: col for col, monomial in enumerate(monomials)}
+        rows = []
+        for shift in shifts:
+            rows.append({columns[monomial]: int(shift.monomial_coefficient(monomial)) for monomial in shift.monomials()})
 
-    monomials = [pr(monomial) for monomial in monomials]
-    return L, monomials
+        monomials = [pr(monomial) for monomial in monomials]
+        exponents = [monomial_exponents(monomial) for monomial in monomials]
+        if record is not None:
+            record["rows"] = len(rows)
+            record["cols"] = len(monomials)
+            record["nonzero_entries"] = sum(len(row) for row in rows)
+
+    return rows, exponents, monomials
+
+
+def scale_lattice(rows, exponents, bounds):
+    """
+    Creates a dense lattice from an unscaled sparse lattice by multiplying each column with its monomial evaluated at the bounds.
+    The rows are consumed while the dense lattice is filled, so both lattices are never fully in memory at the same time.
+    :param rows: the rows (dicts of (column: coefficient) entries), this list will be emptied
+    :param exponents: the column exponents
+    :param bounds: the bounds
+    :return: the lattice
+    """
+    with profiling.stage("scale_lattice") as record:
+        powers = {}
+        scales = []
+        for column_exponents in exponents:
+            scale = 1
+            for i, e in enumerate(column_exponents):
+                if e > 0:
+                    if (i, e) not in powers:
+                        powers[i, e] = int(bounds[i]) ** e
+                    scale *= powers[i, e]
+            scales.append(scale)
+
+        L = matrix(ZZ, len(rows), len(exponents))
+        for row in range(len(rows)):
+            for col, coefficient in rows[row].items():
+                L[row, col] = coefficient * scales[col]
+            rows[row] = None
+
+        rows.clear()
+
+    # Outside of the stage, so the time to collect the information is not measured.
+    profiling.add_lattice_info(record, L)
+    return L
+
+
+def create_lattice(pr, shifts, bounds, order="invlex", sort_shifts_reverse=False, sort_monomials_reverse=False):
+    """
+    Creates a lattice from a list of shift polynomials.
+    :param pr: the polynomial ring
+    :param shifts: the shifts
+    :param bounds: the bounds
+    :param order: the order to sort the shifts/monomials by
+    :param sort_shifts_reverse: set to true to sort the shifts in reverse order
+    :param sort_monomials_reverse: set to true to sort the monomials in reverse order
+    :return: a tuple of lattice and list of monomials
+    """
+    rows, exponents, monomials = create_sparse_lattice(pr, shifts, order, sort_shifts_reverse, sort_monomials_reverse)
+    return scale_lattice(rows, exponents, bounds), monomials
 
 
 def reduce_lattice(L, delta=0.8):
@@ -65,7 +136,25 @@ def reduce_lattice(L, delta=0.8):
     :return: the reduced basis
     """
     logging.debug(f"Reducing a {L.nrows()} x {L.ncols()} lattice...")
-    return L.LLL(delta)
+    with profiling.stage("reduce_lattice", delta=delta) as record:
+        B = L.LLL(delta)
+
+    # Outside of the stage, so the time to collect the information is not measured.
+    profiling.add_lattice_info(record, B)
+    return B
+
+
+def reduce_sparse_lattice(rows, exponents, bounds, delta=0.8):
+    """
+    Scales an unscaled sparse lattice and reduces it.
+    The dense scaled lattice only exists while it is being reduced.
+    :param rows: the rows (dicts of (column: coefficient) entries), this list will be emptied
+    :param exponents: the column exponents
+    :param bounds: the bounds
+    :param delta: the delta parameter for LLL (default: 0.8)
+    :return: the reduced basis
+    """
+    return reduce_lattice(scale_lattice(rows, exponents, bounds), delta)
 
 
 def reconstruct_polynomials(B, f, modulus, monomials, bounds, preprocess_polynomial=lambda x: x, divide_gcd=True):
@@ -83,47 +172,53 @@ def reconstruct_polynomials(B, f, modulus, monomials, bounds, preprocess_polynom
     divide_original = f is not None
     modulus_bound = modulus is not None
     logging.debug(f"Reconstructing polynomials ({divide_original = }, {modulus_bound = }, {divide_gcd = })...")
-    polynomials = []
-    for row in range(B.nrows()):
-        norm_squared = 0
-        w = 0
-        polynomial = 0
-        for col, monomial in enumerate(monomials):
-            if B[row, col] == 0:
+    with profiling.stage("reconstruct_polynomials") as record:
+        scales = [monomial(*bounds) for monomial in monomials]
+        polynomials = []
+        for row in range(B.nrows()):
+            norm_squared = 0
+            w = 0
+            polynomial = 0
+            for col, (monomial, scale) in enumerate(zip(monomials, scales)):
+                value = B[row, col]
+                if value == 0:
+                    continue
+                norm_squared += value ** 2
+                w += 1
+                assert value % scale == 0
+                polynomial += value // scale * monomial
+
+            # Equivalent to norm >= modulus / sqrt(w)
+            if modulus_bound and norm_squared * w >= modulus ** 2:
+                logging.debug(f"Row {row} is too large, ignoring...")
                 continue
-            norm_squared += B[row, col] ** 2
-            w += 1
-            assert B[row, col] % monomial(*bounds) == 0
-            polynomial += B[row, col] * monomial // monomial(*bounds)
 
-        # Equivalent to norm >= modulus / sqrt(w)
-        if modulus_bound and norm_squared * w >= modulus ** 2:
-            logging.debug(f"Row {row} is too large, ignoring...")
-            continue
+            polynomial = preprocess_polynomial(polynomial)
 
-        polynomial = preprocess_polynomial(polynomial)
+            if divide_original and polynomial % f == 0:
+                logging.debug(f"Original polynomial divides reconstructed polynomial at row {row}, dividing...")
+                polynomial //= f
 
-        if divide_original and polynomial % f == 0:
-            logging.debug(f"Original polynomial divides reconstructed polynomial at row {row}, dividing...")
-            polynomial //= f
+            if divide_gcd:
+                for i in range(len(polynomials)):
+                    g = gcd(polynomial, polynomials[i])
+                    # TODO: why are we only allowed to divide out g if it is constant?
+                    if g != 1 and g.is_constant():
+                        logging.debug(f"Reconstructed polynomial has gcd {g} with polynomial at {i}, dividing...")
+                        polynomial //= g
+                        polynomials[i] //= g
 
-        if divide_gcd:
-            for i in range(len(polynomials)):
-                g = gcd(polynomial, polynomials[i])
-                # TODO: why are we only allowed to divide out g if it is constant?
-                if g != 1 and g.is_constant():
-                    logging.debug(f"Reconstructed polynomial has gcd {g} with polynomial at {i}, dividing...")
-                    polynomial //= g
-                    polynomials[i] //= g
+            if polynomial.is_constant():
+                logging.debug(f"Polynomial at row {row} is constant, ignoring...")
+                continue
 
-        if polynomial.is_constant():
-            logging.debug(f"Polynomial at row {row} is constant, ignoring...")
-            continue
+            if DEBUG_ROOTS is not None:
+                logging.debug(f"Polynomial at row {row} roots check: {polynomial(*DEBUG_ROOTS)}")
 
-        if DEBUG_ROOTS is not None:
-            logging.debug(f"Polynomial at row {row} roots check: {polynomial(*DEBUG_ROOTS)}")
+            polynomials.append(polynomial)
 
-        polynomials.append(polynomial)
+        if record is not None:
+            record["polynomials"] = len(polynomials)
 
     logging.debug(f"Reconstructed {len(polynomials)} polynomials")
     return polynomials
@@ -279,6 +374,10 @@ def find_roots(pr, polynomials, method="groebner"):
     :param method: the method to use, can be "groebner", "resultants", or "variety" (default: "groebner")
     :return: a generator generating dicts of (x0: x0root, x1: x1root, ...) entries
     """
+    return profiling.stage_generator("find_roots", _find_roots(pr, polynomials, method))
+
+
+def _find_roots(pr, polynomials, method):
     if pr.ngens() == 1:
         logging.debug("Using univariate polynomial to find roots...")
         for polynomial in polynomials:
@@ -3,6 +3,7 @@ import logging
 from sage.all import ZZ
 
 from shared import small_roots
+from shared.small_roots import profiling
 
 
 def modular_bivariate(f, e, m, t, X, Y, roots_method="groebner"):
@@ -24,18 +25,20 @@ def modular_bivariate(f, e, m, t, X, Y, roots_method="groebner"):
 
     logging.debug("Generating shifts...")
 
-    shifts = []
-    for k in range(m + 1):
-        for i in range(m - k + 1):
-            g = x ** i * f ** k * e ** (m - k)
-            shifts.append(g)
+    with profiling.stage("generate_shifts", m=m, t=t):
+        shifts = []
+        for k in range(m + 1):
+            for i in range(m - k + 1):
+                g = x ** i * f ** k * e ** (m - k)
+                shifts.append(g)
 
-        for j in range(t + 1):
-            h = y ** j * f ** k * e ** (m - k)
-            shifts.append(h)
+            for j in range(t + 1):
+                h = y ** j * f ** k * e ** (m - k)
+                shifts.append(h)
 
-    L, monomials = small_roots.create_lattice(pr, shifts, [X, Y])
-    L = small_roots.reduce_lattice(L)
+    rows, exponents, monomials = small_roots.create_sparse_lattice(pr, shifts)
+    del shifts
+    L = small_roots.reduce_sparse_lattice(rows, exponents, [X, Y])
     polynomials = small_roots.reconstruct_polynomials(L, f, e ** m, monomials, [X, Y])
     for roots in small_roots.find_roots(pr, polynomials, method=roots_method):
         yield roots[x], roots[y]
@@ -4,6 +4,8 @@ from math import gcd
 from sage.all import ZZ
 
 from shared import small_roots
+from shared.small_roots import lattice_cache
+from shared.small_roots import profiling
 
 
 def _get_shifts(m, x, k, shift, j, sum, shifts):
@@ -40,14 +42,23 @@ def modular_multivariate(f, N, m, t, X, roots_method="groebner"):
     assert gcd(al, N) == 1
     f_ = (pow(al, -1, N) * f % N).change_ring(ZZ)
 
-    logging.debug("Generating shifts...")
+    key = lattice_cache.instance_key("herrmann_may_multivariate", f, N, X, m, t)
+    cached = lattice_cache.load(key, pr)
+    if cached is None:
+        logging.debug("Generating shifts...")
 
-    shifts = []
-    for k in range(m + 1):
-        _get_shifts(m, x, k, f_ ** k * N ** max(t - k, 0), 1, 0, shifts)
+        with profiling.stage("generate_shifts", m=m, t=t):
+            shifts = []
+            for k in range(m + 1):
+                _get_shifts(m, x, k, f_ ** k * N ** max(t - k, 0), 1, 0, shifts)
+
+        rows, exponents, monomials = small_roots.create_sparse_lattice(pr, shifts)
+        del shifts
+        L = small_roots.reduce_sparse_lattice(rows, exponents, X)
+        lattice_cache.store(key, L, monomials)
+    else:
+        L, monomials = cached
 
-    L, monomials = small_roots.create_lattice(pr, shifts, X)
-    L = small_roots.reduce_lattice(L)
     polynomials = small_roots.reconstruct_polynomials(L, f, N, monomials, X)
     for roots in small_roots.find_roots(pr, polynomials, method=roots_method):
         yield tuple(roots[xi] for xi in x)
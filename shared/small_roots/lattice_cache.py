@@ -0,0 +1,176 @@
+import hashlib
+import logging
+import mmap
+import os
+import struct
+
+from sage.all import ZZ
+from sage.all import matrix
+
+from shared import small_roots
+
+# Directory to store reduced lattices in (set to None to disable the cache).
+CACHE_DIR = None
+# Maximum total size of the cache directory in bytes, least recently used entries are evicted first.
+MAX_SIZE = 1 << 30
+
+# Bump the version when create_lattice or reduce_lattice change the bases they produce, so stale entries are not used.
+_MAGIC = b"LTC2"
+_SUFFIX = ".lattice"
+_HEADER = struct.Struct("<4sIII")
+_LENGTH = struct.Struct("<i")
+
+
+def instance_key(method, f, modulus, bounds, m, t, order="invlex", delta=0.8):
+    """
+    Computes a content-addressed key for a small roots instance.
+    :param method: the name of the small roots method
+    :param f: the polynomial
+    :param modulus: the modulus
+    :param bounds: the bounds
+    :param m: the parameter m
+    :param t: the parameter t
+    :param order: the order used to create the lattice (default: "invlex")
+    :param delta: the delta parameter used to reduce the lattice (default: 0.8)
+    :return: a hexadecimal key
+    """
+    data = repr((_MAGIC, method, str(f.parent()), str(f), int(modulus), [int(bound) for bound in bounds], m, t, order, float(delta)))
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def _path(key):
+    return os.path.join(CACHE_DIR, key + _SUFFIX)
+
+
+def _monomial(pr, exponents):
+    monomial = pr(1)
+    for gen, e in zip(pr.gens(), exponents):
+        monomial *= gen ** e
+
+    return monomial
+
+
+def _decode(buffer, nvars):
+    magic, nrows, ncols, nvars_ = _HEADER.unpack_from(buffer, 0)
+    if magic != _MAGIC or nvars_ != nvars:
+        raise ValueError("header mismatch")
+
+    offset = _HEADER.size
+    exponents = struct.unpack_from(f"<{ncols * nvars}I", buffer, offset)
+    offset += 4 * ncols * nvars
+    exponents = [exponents[col * nvars:(col + 1) * nvars] for col in range(ncols)]
+
+    entries = []
+    for _ in range(nrows * ncols):
+        (length,) = _LENGTH.unpack_from(buffer, offset)
+        offset += _LENGTH.size
+        if offset + abs(length) > len(buffer):
+            raise ValueError("truncated entry")
+
+        value = int.from_bytes(buffer[offset:offset + abs(length)], "little")
+        offset += abs(length)
+        entries.append(-value if length < 0 else value)
+
+    if offset != len(buffer):
+        raise ValueError("trailing data")
+
+    return nrows, ncols, exponents, entries
+
+
+def load(key, pr):
+    """
+    Loads a reduced lattice basis and its monomials from the cache.
+    :param key: the instance key
+    :param pr: the polynomial ring of the monomials
+    :return: a tuple of reduced basis and list of monomials, or None if the instance is not cached
+    """
+    if CACHE_DIR is None:
+        return None
+
+    path = _path(key)
+    try:
+        with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            nrows, ncols, exponents, entries = _decode(mm, pr.ngens())
+        # Entries may be evicted by another process at any time.
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    except (ValueError, struct.error) as e:
+        logging.debug(f"Ignoring invalid cache entry {key}: {e}")
+        return None
+    except OSError as e:
+        logging.debug(f"Unable to load cache entry {key}: {e}")
+        return None
+
+    monomials = [_monomial(pr, e) for e in exponents]
+    logging.debug(f"Loaded a {nrows} x {ncols} reduced lattice from cache entry {key}")
+    return matrix(ZZ, nrows, ncols, entries), monomials
+
+
+def store(key, B, monomials):
+    """
+    Stores a reduced lattice basis and its monomials in the cache, evicting old entries if necessary.
+    :param key: the instance key
+    :param B: the reduced basis
+    :param monomials: the monomials
+    """
+    if CACHE_DIR is None:
+        return
+
+    nvars = monomials[0].parent().ngens()
+    path = _path(key)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(tmp_path, "wb") as file:
+            file.write(_HEADER.pack(_MAGIC, B.nrows(), B.ncols(), nvars))
+            exponents = [e for monomial in monomials for e in small_roots.monomial_exponents(monomial)]
+            file.write(struct.pack(f"<{len(exponents)}I", *exponents))
+            for value in B.list():
+                value = int(value)
+                data = abs(value).to_bytes((abs(value).bit_length() + 7) // 8, "little")
+                file.write(_LENGTH.pack(-len(data) if value < 0 else len(data)))
+                file.write(data)
+
+        os.replace(tmp_path, path)
+    except OSError as e:
+        # The cache is only an optimization, so the attack continues if the entry can't be written (e.g. the disk is full).
+        logging.debug(f"Unable to store cache entry {key}: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+        return
+
+    logging.debug(f"Stored a {B.nrows()} x {B.ncols()} reduced lattice in cache entry {key}")
+    _evict(path)
+
+
+def _evict(stored_path):
+    entries = []
+    for entry in os.scandir(CACHE_DIR):
+        if entry.name.endswith(_SUFFIX):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    size = sum(entry[1] for entry in entries)
+    for _, entry_size, path in sorted(entries):
+        if size <= MAX_SIZE:
+            break
+
+        # Never evict the entry that was just stored, even if it is larger than the maximum size on its own.
+        if path == stored_path:
+            continue
+
+        logging.debug(f"Evicting cache entry {path}")
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+        size -= entry_size
@@ -0,0 +1,202 @@
+import json
+import resource
+import time
+from contextlib import contextmanager
+
+# The collected stage records (set to None to disable profiling).
+RECORDS = None
+# The records of the stages which are currently running, innermost last.
+_RUNNING = []
+
+
+def enable():
+    """
+    Enables profiling, discarding any previously collected stage records.
+    """
+    global RECORDS
+    RECORDS = []
+
+
+def disable():
+    """
+    Disables profiling.
+    :return: the collected stage records
+    """
+    global RECORDS
+    records = RECORDS
+    RECORDS = None
+    return records
+
+
+def _rss():
+    # The current resident set size in bytes, only available on Linux.
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        return None
+
+
+def _peak_rss():
+    # The peak resident set size in bytes since the last reset, only available on Linux.
+    try:
+        with open("/proc/self/status") as file:
+            for line in file:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    return None
+
+
+def _reset_peak_rss():
+    # Resets the peak resident set size to the current resident set size, only available on Linux.
+    try:
+        with open("/proc/self/clear_refs", "w") as file:
+            file.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _update_peaks():
+    peak = _peak_rss()
+    if peak is None:
+        return
+
+    for record in _RUNNING:
+        if record["peak_memory"] is not None:
+            record["peak_memory"] = max(record["peak_memory"], peak)
+
+
+def _enter(record):
+    # The peak is reset for every stage, so the peaks reached so far are first stored in the running stages.
+    _update_peaks()
+    if _reset_peak_rss():
+        record.setdefault("peak_memory", 0)
+    else:
+        record["peak_memory"] = None
+
+    _RUNNING.append(record)
+
+
+def _exit(record):
+    _update_peaks()
+    _RUNNING.remove(record)
+
+
+def _start(name, info):
+    record = {"stage": name, **info}
+    record["rss_before"] = _rss()
+    _enter(record)
+    record["_wall"] = time.perf_counter()
+    record["_cpu"] = time.process_time()
+    return record
+
+
+def _stop(record):
+    record["wall_time"] = time.perf_counter() - record.pop("_wall")
+    record["cpu_time"] = time.process_time() - record.pop("_cpu")
+    _exit(record)
+    record["rss_after"] = _rss()
+    if RECORDS is not None:
+        RECORDS.append(record)
+
+
+@contextmanager
+def _stage(name, info):
+    record = _start(name, info)
+    try:
+        yield record
+    finally:
+        _stop(record)
+
+
+@contextmanager
+def _null_stage():
+    yield None
+
+
+def stage(name, **info):
+    """
+    Returns a context manager measuring a pipeline stage.
+    The peak memory of a stage is measured by resetting the peak resident set size of the process when the stage starts.
+    The context manager yields the stage record, which can be extended with additional information, or None if profiling is disabled.
+    :param name: the name of the stage
+    :param info: additional information to store in the stage record
+    :return: the context manager
+    """
+    if RECORDS is None:
+        return _null_stage()
+
+    return _stage(name, info)
+
+
+def stage_generator(name, generator):
+    """
+    Measures a pipeline stage implemented as a generator.
+    Only time spent inside the generator is counted, not time spent by the consumer.
+    :param name: the name of the stage
+    :param generator: the generator
+    :return: a generator generating the same values as the original generator
+    """
+    if RECORDS is None:
+        return generator
+
+    return _stage_generator(name, generator)
+
+
+def _stage_generator(name, generator):
+    record = {"stage": name, "rss_before": _rss(), "wall_time": 0.0, "cpu_time": 0.0, "results": 0}
+    try:
+        while True:
+            _enter(record)
+            wall = time.perf_counter()
+            cpu = time.process_time()
+            try:
+                value = next(generator)
+            except StopIteration:
+                return
+            finally:
+                record["wall_time"] += time.perf_counter() - wall
+                record["cpu_time"] += time.process_time() - cpu
+                _exit(record)
+
+            record["results"] += 1
+            yield value
+    finally:
+        record["rss_after"] = _rss()
+        if RECORDS is not None:
+            RECORDS.append(record)
+
+
+def add_lattice_info(record, L):
+    """
+    Adds the dimension, the shape and the bit sizes of the largest entries of a lattice to a stage record.
+    The per row nonzero counts and maximum bit sizes replace the row by row picture of log_lattice.
+    :param record: the stage record (if set to None, nothing is added)
+    :param L: the lattice
+    """
+    if record is None:
+        return
+
+    row_bit_lengths = [[int(entry).bit_length() for entry in row if entry != 0] for row in L.rows()]
+    bit_lengths = [bit_length for row in row_bit_lengths for bit_length in row]
+    record["rows"] = L.nrows()
+    record["cols"] = L.ncols()
+    record["nonzero_entries"] = len(bit_lengths)
+    record["max_entry_bits"] = max(bit_lengths, default=0)
+    record["largest_entry_bits"] = sorted(bit_lengths, reverse=True)[:8]
+    record["row_nonzero_entries"] = [len(row) for row in row_bit_lengths]
+    record["row_max_entry_bits"] = [max(row, default=0) for row in row_bit_lengths]
+
+
+def to_json(records=None, **kwargs):
+    """
+    Serializes stage records to JSON.
+    :param records: the stage records (default: the currently collected records)
+    :param kwargs: additional arguments for json.dumps
+    :return: the JSON string
+    """
+    return json.dumps(RECORDS if records is None else records, **kwargs)
@@ -0,0 +1,6 @@
+import os
+import sys
+
+path = os.path.dirname(os.path.dirname(os.path.realpath(os.path.abspath(__file__))))
+if path not in sys.path:
+    sys.path.insert(1, path)
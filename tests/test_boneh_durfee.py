@@ -0,0 +1,93 @@
+import logging
+import re
+
+import pytest
+
+pytest.importorskip("sage.all")
+
+from sage.all import ZZ
+from sage.all import Zmod
+
+import boneh_durfee
+from attacks import known_phi
+from benchmarks import fixtures
+
+
+@pytest.fixture
+def key():
+    key = fixtures.small_d_key(1, 128, 0.2)
+    p, q = key["factors"]
+    key["phi"] = (p - 1) * (q - 1)
+    # e * d = 1 + k * phi
+    key["k"] = (key["e"] * key["d"] - 1) // key["phi"]
+    return key
+
+
+def _f_e(key):
+    # The polynomial used by attack without known bits of p: x * (N + 1 + y) + 1 has root (k, -(p + q)) modulo e.
+    x, y = ZZ["x", "y"].gens()
+    return (x * (key["N"] + 1 + y) + 1).change_ring(Zmod(key["e"]))
+
+
+def test_recover_sum(key):
+    N, e = key["N"], key["e"]
+    p, q = key["factors"]
+    f_e = _f_e(key)
+    assert boneh_durfee._recover_sum(N, e, f_e, key["k"], -(p + q)) == p + q
+    assert boneh_durfee._recover_sum(N, e, f_e, key["k"], -(p + q) + 1) is None
+    assert boneh_durfee._recover_sum(N, e, f_e, 0, -(p + q)) is None
+
+    # A root modulo e which is not invertible modulo e.
+    x, y = Zmod(e)["x", "y"].gens()
+    assert boneh_durfee._recover_sum(N, e, x * y, 0, 1) is None
+    assert boneh_durfee._recover_sum(N, e, x * y, e, 1) is None
+
+
+def test_factorize(key):
+    p, q = key["factors"]
+    assert set(known_phi.factorize(key["N"], key["phi"])) == {p, q}
+    assert known_phi.factorize(key["N"], key["phi"] + 2) is None
+    assert known_phi.factorize(key["N"], key["N"] + 1) is None
+
+
+class _KnownLsb:
+    def __init__(self, p, bit_length):
+        self.lsb = p % 2**bit_length
+        self.bit_length = bit_length
+
+    def get_known_lsb(self):
+        return self.lsb, self.bit_length
+
+
+def _tried(caplog):
+    for record in caplog.records:
+        match = re.match(r"Tried (\d+) of (\d+) guesses", record.getMessage())
+        if match:
+            return int(match.group(1)), int(match.group(2))
+
+
+def test_attack_guessed_lsb(caplog):
+    # Only the least significant bit of p is known, and m = 1 is too small for the full attack.
+    key = fixtures.small_d_key(1, 128, 0.22)
+    assert boneh_durfee.attack(key["N"], key["e"], 128, delta=0.22, m=1) is None
+
+    with caplog.at_level(logging.INFO):
+        factors = boneh_durfee.attack_guessed_lsb(key["N"], key["e"], 128, 2, delta=0.22, m=1, processes=2, full_m=1)
+
+    assert set(factors) == set(key["factors"])
+    assert "Trying 4 guesses for the 3 least significant bits of p" in caplog.text
+    assert "times the worst case of the guessing attack" in caplog.text
+
+
+def test_attack_guessed_lsb_early_stop(caplog):
+    key = fixtures.small_d_key(1, 128, 0.22)
+    p, _ = key["factors"]
+    # The next 3 bits of p are zero, so the first guess is correct.
+    assert (p >> 6) % 8 == 0
+    with caplog.at_level(logging.INFO):
+        factors = boneh_durfee.attack_guessed_lsb(key["N"], key["e"], 128, 3, partial_p=_KnownLsb(p, 6), delta=0.22, m=1, processes=2)
+
+    assert set(factors) == set(key["factors"])
+    tried, guesses = _tried(caplog)
+    assert guesses == 8
+    assert tried < guesses
@@ -0,0 +1,116 @@
+import os
+from random import Random
+
+import pytest
+
+pytest.importorskip("sage.all")
+
+from sage.all import ZZ
+from sage.all import matrix
+from sage.all import next_prime
+
+from shared.small_roots import herrmann_may_multivariate
+from shared.small_roots import lattice_cache
+from shared.small_roots import profiling
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(lattice_cache, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(lattice_cache, "MAX_SIZE", 1 << 30)
+    return tmp_path
+
+
+def _basis(nrows, ncols):
+    entries = [0 if i % 3 == 0 else (-1) ** i * (i + 1) ** 200 for i in range(nrows * ncols)]
+    return matrix(ZZ, nrows, ncols, entries)
+
+
+def test_round_trip_multivariate(cache_dir):
+    pr = ZZ["x", "y", "u"]
+    x, y, u = pr.gens()
+    monomials = [pr(1), x, x * y**2, u**3, x**2 * y * u]
+    B = _basis(4, len(monomials))
+    lattice_cache.store("multivariate", B, monomials)
+    B_, monomials_ = lattice_cache.load("multivariate", pr)
+    assert B_ == B
+    assert monomials_ == monomials
+
+
+def test_round_trip_univariate(cache_dir):
+    pr = ZZ["x"]
+    x = pr.gen()
+    monomials = [pr(1), x, x**5]
+    B = _basis(3, len(monomials))
+    lattice_cache.store("univariate", B, monomials)
+    B_, monomials_ = lattice_cache.load("univariate", pr)
+    assert B_ == B
+    assert monomials_ == monomials
+
+
+def test_corrupt_entries_are_ignored(cache_dir):
+    pr = ZZ["x", "y"]
+    x, y = pr.gens()
+    lattice_cache.store("corrupt", _basis(2, 2), [x, y])
+    path = cache_dir / ("corrupt" + lattice_cache._SUFFIX)
+    data = path.read_bytes()
+
+    path.write_bytes(data[:-1])
+    assert lattice_cache.load("corrupt", pr) is None
+    path.write_bytes(data + b"\x00")
+    assert lattice_cache.load("corrupt", pr) is None
+    assert lattice_cache.load("missing", pr) is None
+
+
+def test_eviction_keeps_stored_entry(cache_dir, monkeypatch):
+    pr = ZZ["x", "y"]
+    x, y = pr.gens()
+    monkeypatch.setattr(lattice_cache, "MAX_SIZE", 1)
+    lattice_cache.store("old", _basis(2, 2), [x, y])
+    lattice_cache.store("new", _basis(2, 2), [x, y])
+    assert sorted(os.listdir(cache_dir)) == ["new" + lattice_cache._SUFFIX]
+
+
+def test_store_ignores_os_errors(tmp_path, monkeypatch):
+    # The cache directory can't be created, because a file exists at its path.
+    path = tmp_path / "file"
+    path.write_bytes(b"")
+    monkeypatch.setattr(lattice_cache, "CACHE_DIR", str(path))
+    pr = ZZ["x", "y"]
+    x, y = pr.gens()
+    lattice_cache.store("unwritable", _basis(2, 2), [x, y])
+    assert lattice_cache.load("unwritable", pr) is None
+    assert os.listdir(tmp_path) == ["file"]
+
+
+def _modular_multivariate(f, N, m, t, X):
+    profiling.enable()
+    try:
+        roots = list(herrmann_may_multivariate.modular_multivariate(f, N, m, t, X))
+    finally:
+        records = profiling.disable()
+
+    return roots, [record["stage"] for record in records]
+
+
+def test_modular_multivariate_uses_cache(cache_dir):
+    # f has a small root modulo the unknown divisor p of N.
+    rng = Random(1)
+    p = int(next_prime(rng.getrandbits(256)))
+    q = int(next_prime(rng.getrandbits(256)))
+    N = p * q
+    x0 = rng.getrandbits(20)
+    y0 = rng.getrandbits(20)
+    a = rng.getrandbits(512) % N
+    x, y = ZZ["x", "y"].gens()
+    f = x + a * y - (x0 + a * y0) % p
+
+    roots, stages = _modular_multivariate(f, N, 3, 1, [2**20, 2**20])
+    assert roots == [(x0, y0)]
+    assert "create_lattice" in stages
+    assert len(os.listdir(cache_dir)) == 1
+
+    cached_roots, stages = _modular_multivariate(f, N, 3, 1, [2**20, 2**20])
+    assert cached_roots == roots
+    assert "create_lattice" not in stages
+    assert "reduce_lattice" not in stages
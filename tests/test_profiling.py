@@ -0,0 +1,101 @@
+import importlib.util
+import os
+
+import pytest
+
+# The profiling module does not depend on Sage, so it is loaded directly to avoid importing the small_roots package.
+_spec = importlib.util.spec_from_file_location(
+    "profiling", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "shared", "small_roots", "profiling.py")
+)
+profiling = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(profiling)
+
+MB = 1 << 20
+
+
+@pytest.fixture
+def records():
+    profiling.enable()
+    yield profiling.RECORDS
+    profiling.disable()
+
+
+@pytest.fixture
+def peak_supported():
+    if not profiling._reset_peak_rss() or profiling._peak_rss() is None:
+        pytest.skip("peak resident set size cannot be reset on this platform")
+
+
+def _allocate(size):
+    data = bytearray(size)
+    # Touch every page so it becomes resident.
+    for i in range(0, size, 4096):
+        data[i] = 1
+    del data
+
+
+def test_disabled_stage_is_free():
+    profiling.disable()
+    with profiling.stage("stage") as record:
+        assert record is None
+
+    generator = iter([1, 2])
+    assert profiling.stage_generator("stage", generator) is generator
+
+
+def test_stage_records(records):
+    with profiling.stage("stage", m=3) as record:
+        record["extra"] = 1
+
+    assert len(records) == 1
+    assert records[0]["stage"] == "stage"
+    assert records[0]["m"] == 3
+    assert records[0]["extra"] == 1
+    assert records[0]["wall_time"] >= 0
+    assert records[0]["cpu_time"] >= 0
+    assert "_wall" not in records[0]
+    assert profiling.to_json()
+
+
+def test_peak_memory_of_freed_allocations(records, peak_supported):
+    with profiling.stage("large"):
+        _allocate(200 * MB)
+
+    with profiling.stage("small"):
+        _allocate(1 * MB)
+
+    large, small = records
+    assert large["peak_memory"] - large["rss_before"] >= 190 * MB
+    assert large["rss_after"] - large["rss_before"] < 100 * MB
+    assert small["peak_memory"] < large["peak_memory"] - 100 * MB
+
+
+def test_peak_memory_of_nested_stages(records, peak_supported):
+    with profiling.stage("outer"):
+        _allocate(200 * MB)
+        with profiling.stage("inner"):
+            _allocate(1 * MB)
+
+    inner, outer = records
+    assert outer["peak_memory"] - outer["rss_before"] >= 190 * MB
+    assert inner["peak_memory"] < outer["peak_memory"] - 100 * MB
+
+
+def test_stage_generator(records, peak_supported):
+    def generator():
+        _allocate(200 * MB)
+        yield 1
+        yield 2
+
+    assert list(profiling.stage_generator("generator", generator())) == [1, 2]
+    assert records[0]["results"] == 2
+    assert records[0]["peak_memory"] - records[0]["rss_before"] >= 190 * MB
+
+
+def test_disable_during_stage():
+    profiling.enable()
+    with profiling.stage("stage"):
+        profiling.disable()
+
+    assert profiling.RECORDS is None
+    assert profiling._RUNNING == []
@@ -0,0 +1,77 @@
+import pytest
+
+pytest.importorskip("sage.all")
+
+from sage.all import ZZ
+from sage.all import matrix
+
+from shared import small_roots
+from shared.small_roots.herrmann_may_multivariate import _get_shifts
+
+
+def _create_lattice_dense(pr, shifts, bounds, order="invlex"):
+    # The dense construction create_lattice used before the sparse representation.
+    if pr.ngens() > 1:
+        pr_ = pr.change_ring(ZZ, order=order)
+        shifts = [pr_(shift) for shift in shifts]
+
+    monomials = set()
+    for shift in shifts:
+        monomials.update(shift.monomials())
+
+    shifts.sort()
+    monomials = sorted(monomials)
+    L = matrix(ZZ, len(shifts), len(monomials))
+    for row, shift in enumerate(shifts):
+        for col, monomial in enumerate(monomials):
+            L[row, col] = shift.monomial_coefficient(monomial) * monomial(*bounds)
+
+    return L, [pr(monomial) for monomial in monomials]
+
+
+def _bivariate_shifts():
+    pr = ZZ["x", "y"]
+    x, y = pr.gens()
+    e = 1000003
+    f = x * (123456 + y) + 1
+    m, t = 3, 1
+    shifts = []
+    for k in range(m + 1):
+        for i in range(m - k + 1):
+            shifts.append(x**i * f**k * e ** (m - k))
+
+        for j in range(t + 1):
+            shifts.append(y**j * f**k * e ** (m - k))
+
+    return pr, shifts, [2**20, 2**30]
+
+
+def _multivariate_shifts():
+    pr = ZZ["x", "y", "z"]
+    x = pr.gens()
+    N = 1000000007
+    f = x[0] + 17 * x[1] + 31 * x[2] + 12345
+    m, t = 3, 1
+    shifts = []
+    for k in range(m + 1):
+        _get_shifts(m, x, k, f**k * N ** max(t - k, 0), 1, 0, shifts)
+
+    return pr, shifts, [2**10, 2**12, 2**14]
+
+
+@pytest.mark.parametrize("instance", [_bivariate_shifts, _multivariate_shifts])
+def test_create_lattice_matches_dense_construction(instance):
+    pr, shifts, bounds = instance()
+    L, monomials = small_roots.create_lattice(pr, list(shifts), bounds)
+    L_, monomials_ = _create_lattice_dense(pr, list(shifts), bounds)
+    assert L == L_
+    assert monomials == monomials_
+
+
+@pytest.mark.parametrize("instance", [_bivariate_shifts, _multivariate_shifts])
+def test_reduce_sparse_lattice_matches_reduce_lattice(instance):
+    pr, shifts, bounds = instance()
+    rows, exponents, _ = small_roots.create_sparse_lattice(pr, list(shifts))
+    L, _ = small_roots.create_lattice(pr, list(shifts), bounds)
+    assert small_roots.reduce_sparse_lattice(rows, exponents, bounds) == small_roots.reduce_lattice(L)
+    assert rows == []